@@ -1,76 +1,102 @@
 #!/usr/bin/env python3
+import mmap
 import os
-import json
 import re
 
+import ijson
+import orjson
+
+# This regex will find "image": "azure-blob://pizza-image/FILENAME.jpg?QUERY" patterns
+# so they can be replaced with "image": "FILENAME.jpg"
+IMAGE_PATH_RE = re.compile(rb'"image"\s*:\s*"[^"]*\/([^"\/\?]+\.(?i:jpg|jpeg|png))(?:\?[^"]*)?"', re.ASCII)
+
+# Output is written through a large buffer so the many small per-item writes
+# are batched into few write syscalls
+WRITE_BUFFER_SIZE = 1 << 20
+
 def clean_image_paths_in_json(json_file_path, output_file_path):
     """
     Reads a JSON file, cleans the image paths to contain only the filename,
     and writes the modified JSON to a new file.
     """
     print(f"Opening JSON file: {json_file_path}")
-    with open(json_file_path, 'r') as f:
-        json_content = f.read()
-    
-    print(f"JSON file size: {len(json_content)} bytes")
+    print(f"JSON file size: {os.path.getsize(json_file_path)} bytes")
     
-    # Try to load the entire JSON
+    # Stream the JSON one top-level item at a time so that only a single
+    # record is held in memory, writing each one out as soon as it is cleaned
     try:
-        data = json.loads(json_content)
-        print(f"Successfully parsed JSON data. Found {len(data)} top-level items.")
+        # Only a top-level array can be streamed item by item, anything else
+        # is left to the regex fallback below
+        with open(json_file_path, 'rb') as f:
+            _, first_event, _ = next(ijson.parse(f))
+        if first_event != 'start_array':
+            raise ijson.JSONError(f"expected a top-level array, found {first_event}")
         
-        # Counter for modified items
+        print(f"Writing modified JSON to: {output_file_path}")
+        
+        # Counters for parsed and modified items
+        item_count = 0
         modified_count = 0
         
-        # Process the parsed JSON data
-        for idx, item in enumerate(data):
-            if isinstance(item, dict) and 'data' in item and 'image' in item.get('data', {}):
-                image_url = item['data']['image']
-                
-                # Extract just the filename from the URL
-                if '/' in image_url:
-                    parts = image_url.split('/')
-                    # Get the last part which should be the filename
-                    filename = parts[-1]
-                    # Remove query parameters (everything after '?')
-                    if '?' in filename:
-                        filename = filename.split('?')[0]
-                    
-                    # Update the image path to just the filename
-                    item['data']['image'] = filename
-                    modified_count += 1
+        with open(json_file_path, 'rb') as f, open(output_file_path, 'wb', buffering=WRITE_BUFFER_SIZE) as out:
+            out.write(b'[\n')
+            
+            # Process the JSON data item by item
+            for idx, item in enumerate(ijson.items(f, 'item', use_float=True)):
+                item_count += 1
+                if isinstance(item, dict) and 'data' in item and 'image' in item.get('data', {}):
+                    image_url = item['data']['image']
                     
-                    # Show progress
-                    if modified_count <= 5 or modified_count % 100 == 0:
-                        print(f"Modified image path to: {filename}")
+                    # Extract just the filename from the URL
+                    if '/' in image_url:
+                        parts = image_url.split('/')
+                        # Get the last part which should be the filename
+                        filename = parts[-1]
+                        # Remove query parameters (everything after '?')
+                        if '?' in filename:
+                            filename = filename.split('?')[0]
+                        
+                        # Update the image path to just the filename
+                        item['data']['image'] = filename
+                        modified_count += 1
+                        
+                        # Show progress
+                        if modified_count <= 5 or modified_count % 100 == 0:
+                            print(f"Modified image path to: {filename}")
+                
+                if idx:
+                    out.write(b',\n')
+                out.write(orjson.dumps(item, option=orjson.OPT_INDENT_2))
+            
+            out.write(b'\n]')
         
+        print(f"Successfully parsed JSON data. Found {item_count} top-level items.")
         print(f"\nModified {modified_count} image paths in the JSON data.")
-        
-        # Write the modified JSON to a new file
-        print(f"Writing modified JSON to: {output_file_path}")
-        with open(output_file_path, 'w') as f:
-            json.dump(data, f, indent=4)
-        
         print(f"Done! Modified JSON saved to: {output_file_path}")
         
-    except (json.JSONDecodeError, TypeError) as e:
+    except (ijson.JSONError, TypeError) as e:
         print(f"Error parsing JSON: {e}")
         # If JSON parsing fails, we can try to modify the file using regex
         print("JSON parsing failed. Attempting to modify using regex...")
         
-        # This regex will find "image": "azure-blob://pizza-image/FILENAME.jpg?QUERY" patterns
-        # and replace them with "image": "FILENAME.jpg"
-        pattern = r'"image"\s*:\s*"[^"]*\/([^"\/\?]+\.(?:jpg|jpeg|png))(?:\?[^"]*)?"'
-        replacement = r'"image": "\1"'
-        
-        modified_content = re.sub(pattern, replacement, json_content)
-        
-        # Write the modified content to the new file
-        with open(output_file_path, 'w') as f:
-            f.write(modified_content)
+        # Map the file instead of reading it so the regex scans the page cache
+        # directly, and write the modified content to the new file as we go
+        modified_count = 0
+        with open(json_file_path, 'rb') as f, open(output_file_path, 'wb', buffering=WRITE_BUFFER_SIZE) as out:
+            # An empty file can't be mapped and has nothing to rewrite
+            if os.path.getsize(json_file_path):
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    # Copy the unmatched content between matches and rewrite each match
+                    pos = 0
+                    for match in IMAGE_PATH_RE.finditer(mm):
+                        out.write(mm[pos:match.start()])
+                        out.write(b'"image": "' + match.group(1) + b'"')
+                        pos = match.end()
+                        modified_count += 1
+                    out.write(mm[pos:])
         
+        print(f"\nModified {modified_count} image paths using regex.")
         print(f"Done! Modified JSON saved to: {output_file_path}")
-        # We can't accurately count modifications when using regex
 
 def main():
     # Get the current directory of the script
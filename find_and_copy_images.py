@@ -2,14 +2,20 @@
 import os
 import json
 import shutil
+import sys
 import re
+from concurrent.futures import ThreadPoolExecutor
+
+# Matches "image": "azure-blob://pizza-image/FILENAME.jpg?QUERY" patterns,
+# capturing FILENAME.jpg
+IMAGE_PATH_RE = re.compile(rb'"image"\s*:\s*"[^"]*\/([^"\/\?]+\.(?i:jpg|jpeg|png))(?:\?[^"]*)?"', re.ASCII)
 
 def extract_image_names_from_json(json_file_path):
-    """Extract image names from the JSON file"""
-    image_names = []
+    """Extract the set of unique image names from the JSON file"""
+    image_names = set()
     
     print(f"Opening JSON file: {json_file_path}")
-    with open(json_file_path, 'r') as f:
+    with open(json_file_path, 'rb') as f:
         json_content = f.read()
     
     print(f"JSON file size: {len(json_content)} bytes")
@@ -17,6 +23,8 @@ def extract_image_names_from_json(json_file_path):
     # Try to load the entire JSON
     try:
         data = json.loads(json_content)
+        # Release the raw file contents now that they have been parsed
+        del json_content
         print(f"Successfully parsed JSON data. Found {len(data)} top-level items.")
         
         # Process the parsed JSON data
@@ -29,19 +37,87 @@ def extract_image_names_from_json(json_file_path):
                 if parts:
                     # Remove query parameters (everything after '?')
                     filename = parts[-1].split('?')[0]
-                    if any(ext in filename.lower() for ext in ['.jpg', '.jpeg', '.png']):
-                        image_names.append(filename)
+                    if any(ext in filename.lower() for ext in ['.jpg', '.jpeg', '.png']) and filename not in image_names:
+                        image_names.add(filename)
                         if len(image_names) <= 5 or len(image_names) % 100 == 0:
                             print(f"Extracted image name: {filename}")
     except (json.JSONDecodeError, TypeError) as e:
         print(f"Error parsing JSON: {e}")
         # Fall back to regex pattern matching if JSON parsing fails
-        pattern = r'"image"\s*:\s*"[^"]*\/([^"\/\?]+\.(?:jpg|jpeg|png))(?:\?[^"]*)?"'
         print("Falling back to regex pattern matching...")
-        image_names = re.findall(pattern, json_content)
+        # Read the file again since the raw contents may already be released
+        with open(json_file_path, 'rb') as f:
+            image_names = {name.decode() for name in IMAGE_PATH_RE.findall(f.read())}
         print(f"Found {len(image_names)} image names using regex.")
     
-    return image_names
+    return frozenset(image_names)
+
+def walk_files(path):
+    """Recursively yield a DirEntry for every file under path"""
+    try:
+        it = os.scandir(path)
+    except OSError:
+        # Skip unreadable directories (e.g. .Trashes on external volumes), as os.walk does
+        return
+    with it:
+        for entry in it:
+            if entry.is_dir(follow_symlinks=False):
+                yield from walk_files(entry.path)
+            elif entry.is_file():
+                yield entry
+
+def copy_file_contents(source_file, target_file):
+    """Copy file contents in the kernel, returning False if no method was supported"""
+    source_fd, target_fd = source_file.fileno(), target_file.fileno()
+    size = os.fstat(source_fd).st_size
+    remaining = size
+    
+    # copy_file_range (Linux) copies without leaving the kernel and can share
+    # extents on copy-on-write filesystems, sendfile is tried after it
+    copy_chunks = [lambda count: os.sendfile(target_fd, source_fd, size - remaining, count)]
+    if hasattr(os, 'copy_file_range'):
+        copy_chunks.insert(0, lambda count: os.copy_file_range(source_fd, target_fd, count))
+    
+    for copy_chunk in copy_chunks:
+        try:
+            while remaining:
+                copied = copy_chunk(remaining)
+                if not copied:
+                    break
+                remaining -= copied
+        except OSError:
+            # Try the next method if nothing was copied yet, e.g. copy_file_range
+            # across filesystems
+            if remaining != size:
+                raise
+            continue
+        # A method that copies nothing at all is unsupported on some filesystems
+        # (e.g. FUSE on older kernels), so try the next one as for an error
+        if remaining != size or not size:
+            return True
+    
+    return False
+
+def copy_image(source_path, target_path):
+    """Copy a single image and its metadata, returning the error if it failed"""
+    try:
+        # Opening the target would truncate the source if they are the same file,
+        # e.g. when the target directory is inside the source directory
+        if os.path.exists(target_path) and os.path.samefile(source_path, target_path):
+            raise shutil.SameFileError(f"{source_path!r} and {target_path!r} are the same file")
+        
+        # Only hand-roll the Linux fast path, elsewhere (e.g. fcopyfile on macOS)
+        # shutil already uses the platform's in-kernel copy
+        copied = False
+        if sys.platform.startswith('linux'):
+            with open(source_path, 'rb') as source_file, open(target_path, 'wb') as target_file:
+                copied = copy_file_contents(source_file, target_file)
+        if not copied:
+            shutil.copyfile(source_path, target_path)
+        shutil.copystat(source_path, target_path)
+    except Exception as e:
+        return e
+    return None
 
 def recursive_search_and_copy(source_dir, target_dir, image_names):
     """Recursively search for images and copy them to the target directory"""
@@ -50,32 +126,36 @@ def recursive_search_and_copy(source_dir, target_dir, image_names):
         os.makedirs(target_dir)
         print(f"Created directory: {target_dir}")
     
-    found_images = set()
+    # Map each matched image name to the file to copy; a name found in more
+    # than one directory keeps the last match, as the copy would overwrite it
+    matches = {}
     
     print(f"Searching for {len(image_names)} images in {source_dir}...")
     
     # Walk through all directories and files in the source directory
-    for root, _, files in os.walk(source_dir):
-        for file in files:
-            # Check if the file is an image file
-            if file.lower().endswith(('.jpg', '.jpeg', '.png')):
-                # Check if any of the image names from JSON is a substring of the file
-                for image_name in image_names:
-                    if image_name in file:
-                        source_path = os.path.join(root, file)
-                        target_path = os.path.join(target_dir, file)
-                        
-                        # Copy the file to the target directory
-                        try:
-                            shutil.copy2(source_path, target_path)
-                            found_images.add(image_name)
-                            print(f"Copied: {file}")
-                        except Exception as e:
-                            print(f"Error copying {file}: {e}")
-                        break  # Break once we've found a match for this file
+    for entry in walk_files(source_dir):
+        # Check if the file is one of the images from the JSON
+        if entry.name in image_names:
+            matches[entry.name] = entry.path
+    
+    # Copy the matched files concurrently since copying is I/O bound
+    found_images = set()
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        errors = executor.map(
+            copy_image,
+            matches.values(),
+            [os.path.join(target_dir, file) for file in matches],
+        )
+        # Report results here rather than in the workers so output isn't interleaved
+        for file, error in zip(matches, errors):
+            if error:
+                print(f"Error copying {file}: {error}")
+            else:
+                found_images.add(file)
+                print(f"Copied: {file}")
     
     # Report any images that weren't found
-    not_found = set(image_names) - found_images
+    not_found = image_names - found_images
     if not_found:
         print(f"\nWarning: {len(not_found)} images were not found:")
         for i, image in enumerate(sorted(list(not_found))):
@@ -1,5 +1,7 @@
+import html
+import os
 import streamlit as st
-import json
+import orjson
 import pandas as pd
 import math
 
@@ -14,97 +16,106 @@ st.set_page_config(
 JSON_PATH = "label-v1-2-clean.json"
 IMAGE_PREFIX = "https://graffity-public-assets.s3.ap-southeast-1.amazonaws.com/ronn-temp/label_images/"
 ITEMS_PER_PAGE = 100
+ANNOTATION_FIELDS = ['image_quality', 'pizza_quality', 'pizza_quality_reason', 'comments']
+LABEL_FIELDS = ['image_quality', 'pizza_quality', 'pizza_quality_reason']
 
-# Function to load JSON data
-@st.cache_data
+# Function to get a version token for the JSON file, used as a cache key
+def get_data_version():
+    try:
+        return os.path.getmtime(JSON_PATH)
+    except OSError:
+        return None
+
+# Function to load JSON data, only called when extract_annotation_data
+# misses its cache, so the raw document isn't kept around
 def load_json_data():
     try:
-        with open(JSON_PATH, 'r') as file:
-            data = json.load(file)
+        with open(JSON_PATH, 'rb') as file:
+            data = orjson.loads(file.read())
         return data
     except Exception as e:
         st.error(f"Error loading JSON file: {e}")
         return []
 
-# Function to extract annotation data
-def extract_annotation_data(data):
-    annotation_data = []
+# Function to extract annotation data, cached for the current version of the
+# file so that reruns don't need to hash or re-extract the full JSON data
+@st.cache_data(max_entries=1)
+def extract_annotation_data(data_version):
+    data = load_json_data()
+    
+    # One list per column rather than a dict per record, appended to as each
+    # item is processed and handed to the DataFrame column-wise
+    columns = {'image': [], 'image_filename': []}
+    columns.update({field: [] for field in ANNOTATION_FIELDS})
     
     for item in data:
-        # Skip items that don't have the required structure
-        if not isinstance(item, dict):
+        # Skip items that don't have the required structure or an image path
+        if not isinstance(item, dict) or 'annotations' not in item:
             continue
-        
-        if 'data' not in item or 'annotations' not in item:
+        if 'image' not in item.get('data', {}):
             continue
-            
-        # Get image path
-        image_path = None
-        if 'image' in item.get('data', {}):
-            image_filename = item['data']['image']
-            image_path = f"{IMAGE_PREFIX}{image_filename}"
         
-        # Process annotations
-        annotations = item.get('annotations', [])
+        image_filename = item['data']['image']
         
-        # Default values
-        image_quality = "N/A"
-        pizza_quality = "N/A"
-        pizza_quality_reason = "N/A"
-        comments = "N/A"
+        # Default values, the last matching result for a field wins
+        fields = dict.fromkeys(ANNOTATION_FIELDS, "N/A")
         
-        # If there are annotations, extract the relevant fields
-        if annotations:
-            for annotation in annotations:
-                if 'result' in annotation:
-                    for result in annotation['result']:
-                        from_name = result.get('from_name', '')
-                        
-                        # Extract image_quality
-                        if from_name == 'image_quality' and 'value' in result and 'choices' in result['value']:
-                            image_quality = ", ".join(result['value']['choices'])
-                        
-                        # Extract pizza_quality
-                        elif from_name == 'pizza_quality' and 'value' in result and 'choices' in result['value']:
-                            pizza_quality = ", ".join(result['value']['choices'])
-                        
-                        # Extract pizza_quality_reason
-                        elif from_name == 'pizza_quality_reason' and 'value' in result and 'choices' in result['value']:
-                            pizza_quality_reason = ", ".join(result['value']['choices'])
-                        
-                        # Extract comments
-                        elif from_name == 'comments' and 'value' in result and 'text' in result['value']:
-                            comments = result['value']['text']
+        for annotation in item['annotations'] or []:
+            for result in annotation.get('result', []):
+                from_name = result.get('from_name', '')
+                value = result.get('value', {})
+                
+                # Comments join their lines of text, the other fields their choices
+                if from_name == 'comments':
+                    if 'text' in value:
+                        text = value['text']
+                        fields[from_name] = text if isinstance(text, str) else ", ".join(text)
+                elif from_name in fields and 'choices' in value:
+                    fields[from_name] = ", ".join(value['choices'])
         
-        # Only add items that have an image path
-        if image_path:
-            annotation_data.append({
-                'image': image_path,
-                'image_filename': image_filename if 'image_filename' in locals() else "N/A",
-                'image_quality': image_quality,
-                'pizza_quality': pizza_quality,
-                'pizza_quality_reason': pizza_quality_reason,
-                'comments': comments
-            })
+        columns['image'].append(f"{IMAGE_PREFIX}{image_filename}")
+        columns['image_filename'].append(image_filename)
+        for field, value in fields.items():
+            columns[field].append(value)
+    
+    annotation_data = pd.DataFrame(columns)
+    
+    # The label fields only take a handful of values, so store them as categories,
+    # and keep the free text columns as strings so searching them is vectorized
+    annotation_data[LABEL_FIELDS] = annotation_data[LABEL_FIELDS].astype('category')
+    annotation_data[['image', 'image_filename', 'comments']] = (
+        annotation_data[['image', 'image_filename', 'comments']].astype('string')
+    )
     
     return annotation_data
 
+# Function to build the text searched for each image, with the searchable
+# columns joined into one lowercase string, cached for the current version of the file
+@st.cache_data(max_entries=1)
+def get_search_text(data_version):
+    annotation_data = extract_annotation_data(data_version)
+    search_text = annotation_data['image_filename'].astype(str)
+    for field in ANNOTATION_FIELDS:
+        search_text = search_text + '\x00' + annotation_data[field].astype(str)
+    return search_text.str.lower()
+
 # Main function
 def main():
     st.title("🍕 Pizza Image Annotations Viewer")
     
-    # Load data
+    # Load and extract annotation data
+    data_version = get_data_version()
     with st.spinner("Loading annotation data..."):
-        data = load_json_data()
-    
-    # Extract annotation data
-    annotation_data = extract_annotation_data(data)
+        annotation_data = extract_annotation_data(data_version)
     
     # Display total number of images
     st.write(f"Total number of images: {len(annotation_data)}")
     
-    # Pagination
-    total_pages = math.ceil(len(annotation_data) / ITEMS_PER_PAGE)
+    # Pagination, only recomputed when the JSON file changes
+    if st.session_state.get('data_version') != data_version or 'total_pages' not in st.session_state:
+        st.session_state.data_version = data_version
+        st.session_state.total_pages = math.ceil(len(annotation_data) / ITEMS_PER_PAGE)
+    total_pages = st.session_state.total_pages
     
     col1, col2, col3 = st.columns([1, 2, 1])
     with col2:
@@ -115,21 +126,13 @@ def main():
     end_idx = min(start_idx + ITEMS_PER_PAGE, len(annotation_data))
     
     # Get the data for the current page
-    current_page_data = annotation_data[start_idx:end_idx]
-    
-    # Convert to DataFrame for display
-    df = pd.DataFrame(current_page_data)
+    df = annotation_data.iloc[start_idx:end_idx]
     
     # Search functionality
     search_term = st.text_input("Search by filename or annotation content:", "")
     if search_term:
-        df = df[
-            df['image_filename'].str.contains(search_term, case=False, na=False) | 
-            df['image_quality'].str.contains(search_term, case=False, na=False) |
-            df['pizza_quality'].str.contains(search_term, case=False, na=False) |
-            df['pizza_quality_reason'].str.contains(search_term, case=False, na=False) |
-            df['comments'].str.contains(search_term, case=False, na=False)
-        ]
+        search_text = get_search_text(data_version).iloc[start_idx:end_idx]
+        df = df[search_text.str.contains(search_term.lower(), na=False, regex=False)]
     
     # Display the dataframe with image thumbnails
     st.subheader(f"Showing images {start_idx + 1} to {end_idx} out of {len(annotation_data)}")
@@ -145,19 +148,27 @@ def main():
     # Prepare the data for display
     if show_images:
         # Create a custom dataframe display with images
-        for i, row in df.iterrows():
+        rows = zip(
+            df['image'], df['image_filename'], df['image_quality'],
+            df['pizza_quality'], df['pizza_quality_reason'], df['comments'],
+        )
+        for image, image_filename, image_quality, pizza_quality, pizza_quality_reason, comments in rows:
             col1, col2 = st.columns([2, 2])
             
             with col1:
-                # Display image
-                st.image(row['image'], width=image_size, caption=row['image_filename'])
+                # Display image, lazily loaded by the browser straight from the bucket
+                st.markdown(
+                    f'<figure><img src="{html.escape(image)}" width="{image_size}" loading="lazy"/>'
+                    f'<figcaption>{html.escape(str(image_filename))}</figcaption></figure>',
+                    unsafe_allow_html=True,
+                )
             
             with col2:
                 # Display annotations
-                st.write(f"**Image Quality:** {row['image_quality']}")
-                st.write(f"**Pizza Quality:** {row['pizza_quality']}")
-                st.write(f"**Quality Reason:** {row['pizza_quality_reason']}")
-                st.write(f"**Comments:** {row['comments']}")
+                st.write(f"**Image Quality:** {image_quality}")
+                st.write(f"**Pizza Quality:** {pizza_quality}")
+                st.write(f"**Quality Reason:** {pizza_quality_reason}")
+                st.write(f"**Comments:** {comments}")
             
             # Add separator
             st.markdown("---")
@@ -3,15 +3,37 @@ import json
 import pandas as pd
 import math
 from PIL import Image
-import io
 import requests
+from requests.adapters import HTTPAdapter
+
+# Shared session so image requests reuse pooled connections instead of
+# opening a new TCP+TLS connection per image
+_SESSION = requests.Session()
+_SESSION.mount('https://', HTTPAdapter(pool_connections=64, pool_maxsize=64, max_retries=2))
+_SESSION.mount('http://', HTTPAdapter(pool_connections=64, pool_maxsize=64, max_retries=2))
+
+# Function to fetch and decode the image from URL, optionally downscaled to fit
+# within a size x size thumbnail. Errors are raised rather than handled here so
+# that a failed fetch isn't cached
+@st.cache_data(ttl=3600)
+def fetch_image(url, size=None):
+    with _SESSION.get(url, stream=True, timeout=5) as response:
+        response.raise_for_status()  # Raise an error for bad status codes
+        response.raw.decode_content = True
+        img = Image.open(response.raw)
+        if size:
+            # Let the JPEG decoder skip straight to a reduced DCT scale
+            img.draft('RGB', (size, size))
+        # Decode while the response is still open
+        img.load()
+    if size:
+        img.thumbnail((size, size), Image.Resampling.BILINEAR)
+    return img
 
 # Function to load the image from URL with error handling
-def load_image_from_url(url):
+def load_image_from_url(url, size=None):
     try:
-        response = requests.get(url)
-        response.raise_for_status()  # Raise an error for bad status codes
-        return Image.open(io.BytesIO(response.content))
+        return fetch_image(url, size)
     except Exception as e:
         st.warning(f"Could not load image: {url}")
         return None